@@ -1,7 +1,23 @@
+import asyncio
+import json
 import logging
-from typing import Any, Dict, List, Optional
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
+import httpx
 import requests
+from aiolimiter import AsyncLimiter
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:  # HTTP/2 needs the optional "h2" package (httpx[http2])
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
 
 class AdataAPI:
@@ -11,12 +27,150 @@ class AdataAPI:
         self,
         logger: Optional[logging.Logger] = None,
         DO_LOGGING: bool = True,
+        cache_size: int = 4096,
+        cache_path: Optional[str] = None,
+        cache_ttl: int = 3600,
+        max_concurrency: int = 50,
+        rate_limit: float = 20,
+        max_attempts: int = 3,
     ):
         self.logger = logger if logger else logging.getLogger(__name__)
         self.DO_LOGGING = DO_LOGGING
         self.base_url = "https://pk-api.adata.kz/api/v1"
         self.user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
 
+        # One session per client so TCP+TLS connections are reused
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": self.user_agent})
+        adapter = HTTPAdapter(
+            pool_connections=32,
+            pool_maxsize=64,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[429, 500, 502, 503, 504],
+            ),
+        )
+        self.session.mount("https://", adapter)
+
+        # Async client, concurrency cap and rate limiter are created lazily
+        # inside the running event loop
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self.max_attempts = max_attempts
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._rate: Optional[AsyncLimiter] = None
+
+        # In-memory LRU cache of successful responses, keyed by keyword
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._index_cache: "OrderedDict[str, Dict[str, Dict[str, Any]]]" = OrderedDict()
+
+        # Optional SQLite cache so repeated runs skip already fetched keywords.
+        # New rows are buffered and written in one transaction per flush
+        self._cache_db: Optional[sqlite3.Connection] = None
+        self._pending_cache_rows: List[Tuple[str, str, float]] = []
+        if cache_path:
+            self._cache_db = sqlite3.connect(cache_path)
+            self._cache_db.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "keyword TEXT PRIMARY KEY, response TEXT, created_at REAL)"
+            )
+            # Expired rows are never read again, drop them so the file stays small
+            self._cache_db.execute(
+                "DELETE FROM search_cache WHERE created_at <= ?",
+                (time.time() - self.cache_ttl,),
+            )
+            self._cache_db.commit()
+
+    def close(self) -> None:
+        """Close the HTTP session and release the connection pool"""
+        self.session.close()
+        if self._cache_db is not None:
+            self._flush_cache()
+            self._cache_db.close()
+            self._cache_db = None
+
+    async def aclose(self) -> None:
+        """Close the async HTTP client if it was opened"""
+        self._flush_cache()
+        if self._async_client is not None and not self._async_client.is_closed:
+            await self._async_client.aclose()
+        self._async_client = None
+        self._sem = None
+        self._rate = None
+
+    def _get_async_client(
+        self,
+    ) -> Tuple[httpx.AsyncClient, asyncio.Semaphore, AsyncLimiter]:
+        """Return the shared async client with its concurrency cap and limiter"""
+        # With HTTP/2 concurrent requests are multiplexed over one connection;
+        # servers without h2 support are negotiated down to HTTP/1.1 via ALPN
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+                timeout=10.0,
+                headers={"User-Agent": self.user_agent},
+            )
+            self._sem = asyncio.Semaphore(self.max_concurrency)
+            self._rate = AsyncLimiter(self.rate_limit, 1.0)
+        assert self._sem is not None and self._rate is not None
+        return self._async_client, self._sem, self._rate
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _cache_get(self, keyword: str) -> Optional[Dict[str, Any]]:
+        """Return a cached response for keyword or None"""
+        if keyword in self._cache:
+            self._cache.move_to_end(keyword)
+            return self._cache[keyword]
+
+        if self._cache_db is not None:
+            row = self._cache_db.execute(
+                "SELECT response FROM search_cache WHERE keyword = ? AND created_at > ?",
+                (keyword, time.time() - self.cache_ttl),
+            ).fetchone()
+            if row:
+                result = json.loads(row[0])
+                self._remember(keyword, result)
+                return result
+        return None
+
+    def _cache_put(self, keyword: str, result: Dict[str, Any]) -> None:
+        """Cache only successful responses so failures are retried next time"""
+        if result.get("status") is not True:
+            return
+
+        self._remember(keyword, result)
+        if self._cache_db is not None:
+            self._pending_cache_rows.append(
+                (keyword, json.dumps(result, ensure_ascii=False), time.time())
+            )
+
+    def _flush_cache(self) -> None:
+        """Write buffered responses to the SQLite cache in one transaction"""
+        if self._cache_db is None or not self._pending_cache_rows:
+            return
+        self._cache_db.executemany(
+            "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?)",
+            self._pending_cache_rows,
+        )
+        self._cache_db.commit()
+        self._pending_cache_rows.clear()
+
+    def _remember(self, keyword: str, result: Dict[str, Any]) -> None:
+        self._cache[keyword] = result
+        self._cache.move_to_end(keyword)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
     def search(self, keyword: str) -> Dict[str, Any]:
         """
         Search for companies by keyword
@@ -27,9 +181,12 @@ class AdataAPI:
         Returns:
             Dict with search results
         """
+        cached = self._cache_get(keyword)
+        if cached is not None:
+            return cached
+
         url = f"{self.base_url}/data/search"
-        headers = {"User-Agent": self.user_agent}
-        params = {
+        params: Dict[str, Any] = {
             "most_viewed_companies": 0,
             "keyword": keyword,
         }
@@ -38,15 +195,136 @@ class AdataAPI:
             if self.DO_LOGGING and self.logger:
                 self.logger.debug(f"Request to: {url}, with params: {params}")
 
-            response = requests.get(headers=headers, params=params, url=url, timeout=10)
+            response = self.session.get(url, params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
+            result = response.json()
+            self._cache_put(keyword, result)
+            self._flush_cache()
+            return result
 
         except requests.exceptions.RequestException as e:
             if self.DO_LOGGING and self.logger:
                 self.logger.error(f"Request failed: {e}")
             return {"status": False, "error": str(e)}
 
+    async def search_async(self, keyword: str) -> Dict[str, Any]:
+        """
+        Asynchronous version of search() sharing one httpx client
+
+        Args:
+            keyword (str): Search keyword (company name, director name, etc.)
+
+        Returns:
+            Dict with search results. Failed lookups have status False and
+            "transient" set to True if the request may succeed on retry
+        """
+        cached = self._cache_get(keyword)
+        if cached is not None:
+            return cached
+
+        url = f"{self.base_url}/data/search"
+        params: Dict[str, Any] = {
+            "most_viewed_companies": 0,
+            "keyword": keyword,
+        }
+
+        client, sem, rate = self._get_async_client()
+        error = ""
+        for attempt in range(self.max_attempts):
+            try:
+                if self.DO_LOGGING and self.logger:
+                    self.logger.debug(f"Request to: {url}, with params: {params}")
+
+                async with sem, rate:
+                    response = await client.get(url, params=params)
+
+                # Rate limit or server error: back off and try again
+                if response.status_code == 429 or response.status_code >= 500:
+                    error = f"HTTP {response.status_code}"
+                    if attempt + 1 < self.max_attempts:
+                        await asyncio.sleep(self._retry_delay(response, attempt))
+                    continue
+
+                response.raise_for_status()
+                result = response.json()
+                self._cache_put(keyword, result)
+                return result
+
+            except httpx.HTTPStatusError as e:
+                # Other 4xx responses will not succeed on retry
+                if self.DO_LOGGING and self.logger:
+                    self.logger.error(f"Request failed: {e}")
+                return {"status": False, "error": str(e), "transient": False}
+
+            except httpx.HTTPError as e:
+                error = str(e) or type(e).__name__
+                if attempt + 1 < self.max_attempts:
+                    await asyncio.sleep(2**attempt)
+
+        if self.DO_LOGGING and self.logger:
+            self.logger.error(
+                f"Request failed after {self.max_attempts} attempts: {error}"
+            )
+        return {"status": False, "error": error, "transient": True}
+
+    @staticmethod
+    def _retry_delay(response: httpx.Response, attempt: int) -> float:
+        """Delay before the next attempt, based on Retry-After if present"""
+        try:
+            retry_after = float(response.headers.get("Retry-After", 1))
+        except ValueError:
+            retry_after = 1.0
+        return retry_after * 2**attempt
+
+    async def search_bulk_async(
+        self, keywords: List[str], batch_size: int = 50
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Search for many keywords, batch_size concurrent requests at a time
+
+        The API has no batch endpoint, so each batch is a set of concurrent
+        requests over the shared session.
+
+        Args:
+            keywords (List[str]): Search keywords
+            batch_size (int): Number of requests sent together
+
+        Returns:
+            Dict mapping each keyword to its search result
+        """
+        results: Dict[str, Dict[str, Any]] = {}
+        for i in range(0, len(keywords), batch_size):
+            batch = keywords[i : i + batch_size]
+            responses = await asyncio.gather(
+                *(self.search_async(keyword) for keyword in batch),
+                return_exceptions=True,
+            )
+            for keyword, response in zip(batch, responses):
+                if isinstance(response, BaseException):
+                    results[keyword] = {
+                        "status": False,
+                        "error": str(response),
+                        "transient": True,
+                    }
+                else:
+                    results[keyword] = response
+            # One commit per batch instead of one per response
+            self._flush_cache()
+        return results
+
+    def search_bulk(
+        self, keywords: List[str], batch_size: int = 50
+    ) -> Dict[str, Dict[str, Any]]:
+        """Synchronous wrapper around search_bulk_async"""
+
+        async def run() -> Dict[str, Dict[str, Any]]:
+            try:
+                return await self.search_bulk_async(keywords, batch_size)
+            finally:
+                await self.aclose()
+
+        return asyncio.run(run())
+
     def get_company_by_biin(self, biin: str) -> Optional[Dict[str, Any]]:
         """
         Get company details by BIIN (БИИН)
@@ -57,15 +335,37 @@ class AdataAPI:
         Returns:
             Company details or None if not found
         """
-        # First search by BIIN
-        result = self.search(biin)
+        # Exact BIIN match from the indexed search results
+        return self._search_and_index(biin).get(biin)
 
-        if result.get("status") and result["data"]["count_all"] > 0:
-            # Try to find exact BIIN match
-            for company in result["data"]["result"]:
-                if company.get("biin") == biin:
-                    return company
-        return None
+    def _search_and_index(self, keyword: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Search once and index the found companies by BIIN
+
+        Args:
+            keyword (str): Search keyword
+
+        Returns:
+            Dict mapping BIIN to raw company data (first match wins)
+        """
+        if keyword in self._index_cache:
+            self._index_cache.move_to_end(keyword)
+            return self._index_cache[keyword]
+
+        result = self.search(keyword)
+        if not (result.get("status") and result["data"]["count_all"] > 0):
+            return {}
+
+        index: Dict[str, Dict[str, Any]] = {}
+        for company in result["data"]["result"]:
+            biin = company.get("biin")
+            if biin and biin not in index:
+                index[biin] = company
+
+        self._index_cache[keyword] = index
+        if len(self._index_cache) > self.cache_size:
+            self._index_cache.popitem(last=False)
+        return index
 
     def extract_company_info(self, company_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -134,15 +434,21 @@ class AdataAPI:
         if not result.get("status"):
             return []
 
+        search_director = director_name.casefold()
+
         director_companies = []
         for company in result["data"]["result"]:
             # Check if director name matches or is in highlights
-            company_director = company.get("director_name", "").lower()
-            search_director = director_name.lower()
+            company_director = (company.get("director_name") or "").casefold()
+            if search_director in company_director:
+                director_companies.append(self.extract_company_info(company))
+                continue
 
-            if search_director in company_director or any(
-                search_director in str(h).lower() for h in company.get("highlight", [])
-            ):
+            lowered_highlights = [
+                h.casefold() if isinstance(h, str) else str(h).casefold()
+                for h in company.get("highlight", [])
+            ]
+            if any(search_director in h for h in lowered_highlights):
                 director_companies.append(self.extract_company_info(company))
 
         return director_companies
@@ -158,14 +464,18 @@ class AdataAPI:
             True if company exists and is active, False otherwise
         """
         result = self.search(biin_or_name)
+        if not (result.get("status") and result["data"]["count_all"] > 0):
+            return False
 
-        if result.get("status") and result["data"]["count_all"] > 0:
-            for company in result["data"]["result"]:
-                if (
-                    company.get("biin") == biin_or_name
-                    or company.get("name", "").lower() == biin_or_name.lower()
-                ):
-                    return not company.get("is_inactive", False)
+        # The first result matching either the BIIN or the exact
+        # (case-insensitive) name wins, including results without a BIIN
+        biin_or_name_lower = biin_or_name.lower()
+        for company in result["data"]["result"]:
+            if (
+                company.get("biin") == biin_or_name
+                or (company.get("name") or "").lower() == biin_or_name_lower
+            ):
+                return not company.get("is_inactive", False)
         return False
 
 
@@ -190,9 +500,9 @@ if __name__ == "__main__":
 
     # Example 2: Get company by BIIN
     print("\n=== Поиск по БИИН ===")
-    company = api.get_company_by_biin("170740005168")
-    if company:
-        print(f"Найдена компания: {company['name']}")
+    found = api.get_company_by_biin("170740005168")
+    if found:
+        print(f"Найдена компания: {found['name']}")
 
     # Example 3: Check company status
     print("\n=== Проверка статуса компании ===")
@@ -1,8 +1,18 @@
-import re
-
 import openpyxl
 from openpyxl import Workbook
 
+from utils import KEEP_DECIMALS
+
+# Допустимые форматы номеров: +7XXXXXXXXXX и 8XXXXXXXXXX (Россия),
+# +1XXXXXXXXXX (США/Канада), +44XXXXXXXXX(X) (Великобритания) и
+# международные номера из 11-15 цифр. Все они покрываются последним
+# правилом, поэтому после очистки достаточно проверить количество цифр
+_MIN_DIGITS = 11
+_MAX_DIGITS = 15
+
+# Строгая валидация допускает и 10-значные номера
+_STRICT_MIN_DIGITS = 10
+
 
 def validate_phone(phone_value):
     """
@@ -12,25 +22,11 @@ def validate_phone(phone_value):
     if phone_value is None:
         return False
 
-    # Преобразуем в строку
-    phone_str = str(phone_value).strip()
+    # Оставляем только цифры (ведущий "+" на их количество не влияет)
+    digits = str(phone_value).translate(KEEP_DECIMALS)
 
-    # Удаляем все нецифровые символы (кроме + в начале)
-    if phone_str.startswith("+"):
-        cleaned = "+" + re.sub(r"\D", "", phone_str[1:])
-    else:
-        cleaned = re.sub(r"\D", "", phone_str)
-
-    # Проверяем различные форматы номеров
-    patterns = [
-        r"^\+7\d{10}$",  # +71234567890 (Россия)
-        r"^8\d{10}$",  # 81234567890 (Россия)
-        r"^\+?\d{11,15}$",  # Международные номера
-        r"^\+1\d{10}$",  # +11234567890 (США/Канада)
-        r"^\+44\d{9,10}$",  # +441234567890 (Великобритания)
-    ]
-
-    return any(re.match(pattern, cleaned) for pattern in patterns)
+    # Проверяем количество цифр вместо сопоставления с регулярным выражением
+    return _MIN_DIGITS <= len(digits) <= _MAX_DIGITS
 
 
 def filter_excel_by_phone(input_file, output_file, phone_column="Phone"):
@@ -43,46 +39,38 @@ def filter_excel_by_phone(input_file, output_file, phone_column="Phone"):
         phone_column (str): название колонки с телефонами
     """
 
+    workbook = None
     try:
-        # Загружаем исходный файл
-        workbook = openpyxl.load_workbook(input_file)
+        # Загружаем исходный файл в потоковом режиме (только чтение)
+        workbook = openpyxl.load_workbook(input_file, read_only=True, data_only=True)
         sheet = workbook.active
 
-        # Находим индекс колонки с телефонами
-        phone_col_index = None
-        for col in range(1, sheet.max_column + 1):
-            if sheet.cell(row=1, column=col).value == phone_column:
-                phone_col_index = col
-                break
+        # Читаем все строки одним проходом, без обращения к отдельным ячейкам
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, ())
 
-        if phone_col_index is None:
+        # Находим индекс колонки с телефонами
+        if phone_column not in header:
             raise ValueError(f"Колонка '{phone_column}' не найдена в файле")
+        phone_col_index = header.index(phone_column)
 
-        # Создаем новый workbook для результатов
-        new_workbook = Workbook()
-        new_sheet = new_workbook.active
-        new_sheet.title = "Filtered Data"
+        # Создаем новый workbook для результатов (потоковая запись)
+        new_workbook = Workbook(write_only=True)
+        new_sheet = new_workbook.create_sheet("Filtered Data")
 
         # Копируем заголовки
-        for col in range(1, sheet.max_column + 1):
-            new_sheet.cell(row=1, column=col).value = sheet.cell(
-                row=1, column=col
-            ).value
+        new_sheet.append(header)
 
         # Фильтруем строки
         valid_rows_count = 1  # начинаем с 1, т.к. заголовок уже есть
 
-        for row in range(2, sheet.max_row + 1):
-            phone_value = sheet.cell(row=row, column=phone_col_index).value
-
-            if validate_phone(phone_value):
+        for row in rows:
+            # Без <dimension> в файле read-only режим отдаёт строки без
+            # хвостовых пустых ячеек - отсутствующую ячейку считаем пустой
+            phone = row[phone_col_index] if phone_col_index < len(row) else None
+            if validate_phone(phone):
                 valid_rows_count += 1
-
-                # Копируем всю строку
-                for col in range(1, sheet.max_column + 1):
-                    new_sheet.cell(row=valid_rows_count, column=col).value = sheet.cell(
-                        row=row, column=col
-                    ).value
+                new_sheet.append(row)
 
         # Сохраняем результат
         new_workbook.save(output_file)
@@ -92,6 +80,9 @@ def filter_excel_by_phone(input_file, output_file, phone_column="Phone"):
 
     except Exception as e:
         print(f"Произошла ошибка: {e}")
+    finally:
+        if workbook is not None:
+            workbook.close()
 
 
 # Альтернативная версия с более строгой валидацией
@@ -102,25 +93,12 @@ def validate_phone_strict(phone_value):
     if phone_value is None:
         return False
 
-    phone_str = str(phone_value).strip()
-
-    # Базовые проверки
-    if len(phone_str) < 10:
-        return False
-
-    # Удаляем все нецифровые символы (кроме + в начале)
-    if phone_str.startswith("+"):
-        digits = re.sub(r"\D", "", phone_str[1:])
-        full_number = "+" + digits
-    else:
-        digits = re.sub(r"\D", "", phone_str)
-        full_number = digits
+    # Оставляем только цифры; длина исходной строки не меньше их количества,
+    # поэтому отдельная проверка len(phone_str) не нужна
+    digits = str(phone_value).translate(KEEP_DECIMALS)
 
     # Проверяем длину номера
-    if len(digits) < 10 or len(digits) > 15:
-        return False
-
-    return True
+    return _STRICT_MIN_DIGITS <= len(digits) <= _MAX_DIGITS
 
 
 # Пример использования
@@ -2,105 +2,97 @@ import openpyxl
 from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
 from openpyxl.utils import get_column_letter
 
-
-def style_excel_file(input_file, output_file):
+from utils import KEEP_DIGITS
+
+# Цвета
+HEADER_BG_COLOR = "1F4E78"  # Темно-синий
+HEADER_TEXT_COLOR = "FFFFFF"  # Белый
+ACTIVE_STATUS_COLOR = "E2EFDA"  # Светло-зеленый для Active
+ALT_ROW_COLOR = "F2F2F2"  # Светло-серый для чередующихся строк
+
+# Шрифты
+HEADER_FONT = Font(name="Arial", size=12, bold=True, color=HEADER_TEXT_COLOR)
+DATA_FONT = Font(name="Arial", size=10)
+PHONE_FONT = Font(name="Consolas", size=10)  # Моноширинный для телефонов
+EMAIL_FONT = Font(name="Arial", size=10, color="0070C0", underline="single")
+ACTIVE_STATUS_FONT = Font(name="Arial", size=10, bold=True, color="006100")
+
+# Заливка
+HEADER_FILL = PatternFill(
+    start_color=HEADER_BG_COLOR, end_color=HEADER_BG_COLOR, fill_type="solid"
+)
+ACTIVE_FILL = PatternFill(
+    start_color=ACTIVE_STATUS_COLOR,
+    end_color=ACTIVE_STATUS_COLOR,
+    fill_type="solid",
+)
+ALT_ROW_FILL = PatternFill(
+    start_color=ALT_ROW_COLOR, end_color=ALT_ROW_COLOR, fill_type="solid"
+)
+
+# Выравнивание
+CENTER_ALIGN = Alignment(horizontal="center", vertical="center", wrap_text=True)
+LEFT_ALIGN = Alignment(horizontal="left", vertical="center", wrap_text=True)
+
+# Границы
+THIN_BORDER = Border(
+    left=Side(style="thin"),
+    right=Side(style="thin"),
+    top=Side(style="thin"),
+    bottom=Side(style="thin"),
+)
+
+
+def style_excel_file(wb):
     """
-    Преобразует Excel файл в красивый и читаемый формат
+    Преобразует активный лист книги в красивый и читаемый формат
     """
     try:
-        # Загружаем файл
-        wb = openpyxl.load_workbook(input_file)
         ws = wb.active
 
-        # Определяем стили
-        # Цвета
-        HEADER_BG_COLOR = "1F4E78"  # Темно-синий
-        HEADER_TEXT_COLOR = "FFFFFF"  # Белый
-        ACTIVE_STATUS_COLOR = "E2EFDA"  # Светло-зеленый для Active
-        ALT_ROW_COLOR = "F2F2F2"  # Светло-серый для чередующихся строк
-
-        # Шрифты
-        header_font = Font(name="Arial", size=12, bold=True, color=HEADER_TEXT_COLOR)
-        data_font = Font(name="Arial", size=10)
-        phone_font = Font(name="Consolas", size=10)  # Моноширинный для телефонов
-        email_font = Font(name="Arial", size=10, color="0070C0", underline="single")
-
-        # Заливка
-        header_fill = PatternFill(
-            start_color=HEADER_BG_COLOR, end_color=HEADER_BG_COLOR, fill_type="solid"
-        )
-        active_fill = PatternFill(
-            start_color=ACTIVE_STATUS_COLOR,
-            end_color=ACTIVE_STATUS_COLOR,
-            fill_type="solid",
-        )
-        alt_row_fill = PatternFill(
-            start_color=ALT_ROW_COLOR, end_color=ALT_ROW_COLOR, fill_type="solid"
-        )
-
-        # Выравнивание
-        center_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        left_align = Alignment(horizontal="left", vertical="center", wrap_text=True)
-
-        # Границы
-        thin_border = Border(
-            left=Side(style="thin"),
-            right=Side(style="thin"),
-            top=Side(style="thin"),
-            bottom=Side(style="thin"),
-        )
-
-        # Стилизуем заголовки
-        for col in range(1, ws.max_column + 1):
-            cell = ws.cell(row=1, column=col)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = center_align
-            cell.border = thin_border
-
-        # Определяем индексы колонок по заголовкам
+        # Стилизуем заголовки и определяем индексы колонок по заголовкам
         column_indices = {}
-        for col in range(1, ws.max_column + 1):
-            header = ws.cell(row=1, column=col).value
-            if header:
-                column_indices[header] = col
-
-        # Стилизуем данные
-        for row in range(2, ws.max_row + 1):
-            for col in range(1, ws.max_column + 1):
-                cell = ws.cell(row=row, column=col)
-                cell.border = thin_border
-                cell.alignment = left_align
-                cell.font = data_font
-
-                # Чередование цветов строк
-                if row % 2 == 0:
-                    cell.fill = alt_row_fill
-
-        # Специальное форматирование для конкретных колонок
-        if "Phone" in column_indices:
-            phone_col = column_indices["Phone"]
-            for row in range(2, ws.max_row + 1):
-                cell = ws.cell(row=row, column=phone_col)
-                cell.font = phone_font
-                cell.alignment = center_align
-
-        if "Email" in column_indices:
-            email_col = column_indices["Email"]
-            for row in range(2, ws.max_row + 1):
-                cell = ws.cell(row=row, column=email_col)
-                if cell.value:  # Только если есть email
-                    cell.font = email_font
+        for col, cell in enumerate(next(ws.iter_rows(max_row=1), ()), 1):
+            cell.font = HEADER_FONT
+            cell.fill = HEADER_FILL
+            cell.alignment = CENTER_ALIGN
+            cell.border = THIN_BORDER
+            if cell.value:
+                column_indices[cell.value] = col
+
+        # Колонки со специальным форматированием
+        phone_col = column_indices.get("Phone")
+        email_col = column_indices.get("Email")
+        status_col = column_indices.get("Status")
+
+        # Стилизуем данные за один проход по строкам
+        for row, cells in enumerate(ws.iter_rows(min_row=2), 2):
+            # Чередование цветов строк
+            alt_row = row % 2 == 0
+
+            for col, cell in enumerate(cells, 1):
+                cell.border = THIN_BORDER
+                if alt_row:
+                    cell.fill = ALT_ROW_FILL
+
+                if col == phone_col:
+                    cell.font = PHONE_FONT
+                    cell.alignment = CENTER_ALIGN
+                elif col == email_col and cell.value:  # Только если есть email
+                    cell.font = EMAIL_FONT
+                    cell.alignment = LEFT_ALIGN
                     cell.hyperlink = f"mailto:{cell.value}"
-
-        if "Status" in column_indices:
-            status_col = column_indices["Status"]
-            for row in range(2, ws.max_row + 1):
-                cell = ws.cell(row=row, column=status_col)
-                if cell.value and str(cell.value).upper() == "ACTIVE":
-                    cell.fill = active_fill
-                    cell.font = Font(name="Arial", size=10, bold=True, color="006100")
-                    cell.alignment = center_align
+                elif (
+                    col == status_col
+                    and cell.value
+                    and str(cell.value).upper() == "ACTIVE"
+                ):
+                    cell.fill = ACTIVE_FILL
+                    cell.font = ACTIVE_STATUS_FONT
+                    cell.alignment = CENTER_ALIGN
+                else:
+                    cell.font = DATA_FONT
+                    cell.alignment = LEFT_ALIGN
 
         # Настраиваем ширину колонок
         column_widths = {
@@ -123,21 +115,18 @@ def style_excel_file(input_file, output_file):
         # Добавляем фильтры
         ws.auto_filter.ref = ws.dimensions
 
-        # Сохраняем результат
-        wb.save(output_file)
-        print(f"Файл успешно оформлен: {output_file}")
+        print("Файл успешно оформлен")
 
     except Exception as e:
         print(f"Ошибка при оформлении файла: {e}")
 
 
 # Дополнительная функция для улучшения читаемости телефонов
-def format_phone_numbers(input_file):
+def format_phone_numbers(wb):
     """
     Форматирует номера телефонов в единый стиль
     """
     try:
-        wb = openpyxl.load_workbook(input_file)
         ws = wb.active
 
         # Находим колонку Phone
@@ -154,7 +143,7 @@ def format_phone_numbers(input_file):
                     # Очищаем номер от лишних символов
                     phone = str(cell.value).strip()
                     # Удаляем все нецифровые символы
-                    digits = "".join(filter(str.isdigit, phone))
+                    digits = phone.translate(KEEP_DIGITS)
 
                     # Форматируем в международный формат
                     if digits.startswith("7") and len(digits) == 11:
@@ -168,7 +157,6 @@ def format_phone_numbers(input_file):
 
                     cell.value = formatted
 
-        wb.save(input_file)
         print("Номера телефонов отформатированы")
 
     except Exception as e:
@@ -179,10 +167,16 @@ if __name__ == "__main__":
     input_filename = "data/filtered_output.xlsx"
     output_filename = "data/beautiful_output.xlsx"
 
+    # Загружаем файл один раз и сохраняем один раз
+    wb = openpyxl.load_workbook(input_filename)
+
     # Сначала форматируем телефоны
-    format_phone_numbers(input_filename)
+    format_phone_numbers(wb)
 
     # Затем применяем стили
-    style_excel_file(input_filename, output_filename)
+    style_excel_file(wb)
+
+    wb.save(output_filename)
+    print(f"Файл сохранен: {output_filename}")
 
     print("Готово! Файл красиво оформлен и готов к использованию.")
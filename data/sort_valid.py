@@ -1,56 +1,99 @@
+import asyncio
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from parser import Entity, SQLiteSaver
-from typing import List, Set, Tuple
+from typing import Dict, List, Optional, Set, Union
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
 
 from check.adata_search_api import AdataAPI
 
+# Стили отчета создаются один раз и переиспользуются для всех отчетов
+HEADER_FILL = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
+BOLD_FONT = Font(bold=True)
+HEADER_ALIGNMENT = Alignment(horizontal="center", vertical="center")
+
 
 class BinMarker:
     """Оптимизированный класс для поиска актуальных БИНов через API"""
 
-    def __init__(self, api: AdataAPI, logger, max_workers: int = 5):
+    def __init__(
+        self,
+        api: AdataAPI,
+        logger,
+        max_workers: int = 50,
+        checkpoint_db: Optional[SQLiteSaver] = None,
+    ):
         self.api = api
         self.logger = logger
         self.found_bins: Set[str] = set()
         self.max_workers = max_workers
 
-    def _check_ceo_parallel(self, entity: Entity) -> Tuple[str, bool]:
-        """Проверка CEO через API (для многопоточного выполнения)"""
-        try:
-            result = self.api.search(entity.bin)
-            return (entity.bin, bool(result))
-        except Exception as e:
-            self.logger.error(f"Error checking CEO {entity.ceo_name}: {e}")
-            return (entity.bin, False)
+        # Чекпоинт: БИНы, найденные в прошлых запусках, повторно не проверяем
+        self.checkpoint_db = checkpoint_db
+        if checkpoint_db is not None:
+            self.found_bins.update(checkpoint_db.already_found())
 
-    def mark_actual_bins(self, entities: List[Entity]) -> Set[str]:
-        """Массовая проверка БИНов с использованием многопоточности"""
+    async def _check_batch(self, batch_bins: Set[str]) -> List[str]:
+        """Проверяет пачку БИНов, возвращает БИНы с временными ошибками"""
+        results = await self.api.search_bulk_async(
+            list(batch_bins), batch_size=self.max_workers
+        )
+
+        failed = []
+        found = []
+        for keyword, result in results.items():
+            if not result.get("status"):
+                # Ошибку сети или 429 можно повторить, "не найдено" - нет
+                if result.get("transient"):
+                    failed.append(keyword)
+                continue
+            # БИН считается найденным, если он есть в выдаче API
+            for company in result["data"]["result"]:
+                if company.get("biin") in batch_bins:
+                    found.append(company["biin"])
+
+        self.found_bins.update(found)
+        if found and self.checkpoint_db is not None:
+            self.checkpoint_db.mark_found(found)
+        return failed
+
+    async def mark_actual_bins_async(self, entities: List[Entity]) -> Set[str]:
+        """Массовая асинхронная проверка БИНов пачками"""
+        entities = [entity for entity in entities if entity.bin not in self.found_bins]
         self.logger.info(f"Starting bulk check for {len(entities)} entities")
 
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            # Создаем futures для всех entities
-            futures = {
-                executor.submit(self._check_ceo_parallel, entity): entity.bin
-                for entity in entities
-            }
-
-            # Обрабатываем результаты по мере их поступления
-            for future in as_completed(futures):
-                try:
-                    bin_id, is_found = future.result()
-                    if is_found:
-                        self.found_bins.add(bin_id)
-                except Exception as e:
-                    self.logger.error(f"Error processing future: {e}")
+        try:
+            failed: List[str] = []
+            for i in range(0, len(entities), self.max_workers):
+                batch_bins = {
+                    entity.bin for entity in entities[i : i + self.max_workers]
+                }
+                failed.extend(await self._check_batch(batch_bins))
+
+            # Повторяем только БИНы с временными ошибками
+            if failed:
+                self.logger.info(f"Retrying {len(failed)} BINs after transient errors")
+                for i in range(0, len(failed), self.max_workers):
+                    failed_bins = set(failed[i : i + self.max_workers])
+                    still_failed = await self._check_batch(failed_bins)
+                    for bin_id in still_failed:
+                        self.logger.warning(f"Could not check BIN {bin_id}")
+        except Exception as e:
+            self.logger.error(f"Error checking BINs: {e}")
+        finally:
+            await self.api.aclose()
 
         self.logger.info(f"Found {len(self.found_bins)} active BINs")
         return self.found_bins
 
+    def mark_actual_bins(self, entities: List[Entity]) -> Set[str]:
+        """Синхронная обертка над mark_actual_bins_async"""
+        return asyncio.run(self.mark_actual_bins_async(entities))
+
 
 class XLSXGenerator:
     """Класс для генерации XLSX отчетов с использованием openpyxl"""
@@ -58,28 +101,29 @@ class XLSXGenerator:
     def __init__(self, logger=None):
         self.logger = logger or logging.getLogger(__name__)
 
-    def _apply_header_styles(self, worksheet):
-        """Применяет стили к заголовкам"""
-        header_fill = PatternFill(
-            start_color="D3D3D3", end_color="D3D3D3", fill_type="solid"
-        )
-        header_font = Font(bold=True)
-        header_alignment = Alignment(horizontal="center", vertical="center")
-
-        for cell in worksheet[1]:
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = header_alignment
+    def _apply_header_styles(self, worksheet, headers: List) -> List[WriteOnlyCell]:
+        """Создает ячейки заголовков со стилями (для write-only листа)"""
+        cells = []
+        for value in headers:
+            cell = WriteOnlyCell(worksheet, value=value)
+            cell.fill = HEADER_FILL
+            cell.font = BOLD_FONT
+            cell.alignment = HEADER_ALIGNMENT
+            cells.append(cell)
+        return cells
 
     def generate_xlsx_by_bins(
-        self, bin_list: Set[str], all_entities: List[Entity], output_path: str = None
+        self,
+        bin_list: Set[str],
+        all_entities: Union[List[Entity], Dict[str, Entity]],
+        output_path: str = None,
     ) -> str:
         """
         Генерирует XLSX файл только для найденных БИНов
 
         Args:
             bin_list: Set найденных БИНов
-            all_entities: List всех entities из БД
+            all_entities: List всех entities из БД или словарь БИН -> Entity
             output_path: Путь для сохранения (опционально)
 
         Returns:
@@ -89,24 +133,27 @@ class XLSXGenerator:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             output_path = f"active_companies_{timestamp}.xlsx"
 
+        # Индекс по БИНу: поиск O(1) и без дубликатов
+        if isinstance(all_entities, dict):
+            by_bin = all_entities
+        else:
+            by_bin = {entity.bin: entity for entity in all_entities}
+
         # Фильтруем entities только с найденными БИНами
-        filtered_entities = [
-            entity for entity in all_entities if entity.bin in bin_list
-        ]
+        filtered_entities = [by_bin[b] for b in sorted(bin_list) if b in by_bin]
 
         if not filtered_entities:
             self.logger.warning("No entities found for the given BINs")
             return ""
 
         try:
-            # Создаем рабочую книгу
-            wb = Workbook()
+            # Создаем рабочую книгу в потоковом режиме записи
+            wb = Workbook(write_only=True)
 
             # Основной лист с данными
-            ws_main = wb.active
-            ws_main.title = "Active Companies"
+            ws_main = wb.create_sheet("Active Companies")
 
-            # Добавляем заголовки
+            # Заголовки
             headers = [
                 "BIN",
                 #'Company Name',
@@ -116,27 +163,28 @@ class XLSXGenerator:
                 "Email",
                 "Status",
             ]
-            ws_main.append(headers)
-
-            # Добавляем данные
-            for entity in filtered_entities:
-                ws_main.append(
-                    [
-                        entity.bin,
-                        # entity.company_name,
-                        entity.ceo_name,
-                        entity.address_kz,
-                        entity.phone,
-                        entity.email,
-                        "Active",
-                    ]
-                )
-
-            # Применяем стили к заголовкам
-            self._apply_header_styles(ws_main)
-
-            # Настраиваем ширину колонок
-            self._adjust_column_widths(ws_main)
+
+            # Данные
+            rows = [
+                [
+                    entity.bin,
+                    # entity.company_name,
+                    entity.ceo_name,
+                    entity.address_kz,
+                    entity.phone,
+                    entity.email,
+                    "Active",
+                ]
+                for entity in filtered_entities
+            ]
+
+            # Ширину колонок считаем по исходным данным, не обходя ячейки листа
+            self._adjust_column_widths(ws_main, [headers] + rows)
+
+            # Заголовки со стилями, затем данные
+            ws_main.append(self._apply_header_styles(ws_main, headers))
+            for row in rows:
+                ws_main.append(row)
 
             # Добавляем лист со статистикой
             self._add_summary_sheet(wb, len(filtered_entities), len(bin_list))
@@ -150,29 +198,25 @@ class XLSXGenerator:
             self.logger.error(f"Error generating XLSX: {e}")
             raise
 
-    def _adjust_column_widths(self, worksheet):
-        """Автоматически настраивает ширину колонок"""
+    def _adjust_column_widths(self, worksheet, rows: List[List]):
+        """Настраивает ширину колонок по значениям строк"""
         column_widths = {}
 
-        for row in worksheet.iter_rows():
-            for i, cell in enumerate(row):
-                if cell.value:
-                    length = len(str(cell.value))
+        for row in rows:
+            for i, value in enumerate(row):
+                if value:
+                    length = len(str(value))
                     if i not in column_widths or length > column_widths[i]:
                         column_widths[i] = min(length + 2, 50)  # Максимум 50 символов
 
         for i, width in column_widths.items():
-            column_letter = chr(65 + i)  # A, B, C, ...
-            worksheet.column_dimensions[column_letter].width = width
+            # get_column_letter корректно работает и после Z (AA, AB, ...)
+            worksheet.column_dimensions[get_column_letter(i + 1)].width = width
 
     def _add_summary_sheet(self, workbook, total_companies: int, unique_bins: int):
         """Добавляет лист со статистикой"""
         ws_summary = workbook.create_sheet("Summary")
 
-        # Заголовок
-        ws_summary["A1"] = "Report Summary"
-        ws_summary["A1"].font = Font(bold=True, size=14)
-
         # Данные
         summary_data = [
             ["Metric", "Value"],
@@ -182,17 +226,24 @@ class XLSXGenerator:
             ["Data Source", "Adata.kz API + Local Database"],
         ]
 
-        for row_idx, row_data in enumerate(summary_data, start=3):
-            for col_idx, value in enumerate(row_data, start=1):
-                cell = ws_summary.cell(row=row_idx, column=col_idx, value=value)
-                if row_idx == 3:  # Заголовки таблицы
-                    cell.font = Font(bold=True)
-
-        # Применяем стили к заголовкам
-        self._apply_header_styles(ws_summary)
+        # Заголовок занимает строку над таблицей
+        title = ["Report Summary", None]
 
         # Настраиваем ширину колонок
-        self._adjust_column_widths(ws_summary)
+        self._adjust_column_widths(ws_summary, [title] + summary_data)
+
+        # Заголовок
+        ws_summary.append(self._apply_header_styles(ws_summary, title))
+        ws_summary.append([])
+
+        for row_idx, row_data in enumerate(summary_data, start=3):
+            if row_idx == 3:  # Заголовки таблицы
+                row_data = [
+                    WriteOnlyCell(ws_summary, value=value) for value in row_data
+                ]
+                for cell in row_data:
+                    cell.font = BOLD_FONT
+            ws_summary.append(row_data)
 
 
 def main():
@@ -200,7 +251,7 @@ def main():
     # Инициализация компонентов
     db = SQLiteSaver()
     api = AdataAPI()
-    marker = BinMarker(api=api, logger=api.logger, max_workers=10)
+    marker = BinMarker(api=api, logger=api.logger, checkpoint_db=db)
     xlsx_gen = XLSXGenerator(logger=api.logger)
 
     try:
@@ -211,19 +262,30 @@ def main():
             api.logger.warning("No entities found in database")
             return
 
+        # Индекс по БИНу строим один раз и переиспользуем для отчетов
+        entities_by_bin: Dict[str, Entity] = {
+            entity.bin: entity for entity in all_entities
+        }
+
         # Массовая проверка БИНов
         found_bins = marker.mark_actual_bins(all_entities)
 
         if found_bins:
             # Генерация отчета
-            xlsx_path = xlsx_gen.generate_xlsx_by_bins(found_bins, all_entities)
+            xlsx_path = xlsx_gen.generate_xlsx_by_bins(found_bins, entities_by_bin)
             api.logger.info(f"Report generated: {xlsx_path}")
+
+            # Отчет записан - чекпоинт нужен только для возобновления после
+            # сбоя, следующий запуск должен проверить все БИНы заново
+            db.clear_found()
         else:
             api.logger.info("No active companies found")
 
     except Exception as e:
         api.logger.error(f"Error in main process: {e}")
         raise
+    finally:
+        api.close()
 
 
 if __name__ == "__main__":
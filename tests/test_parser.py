@@ -0,0 +1,318 @@
+import asyncio
+import copy
+import dataclasses
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+import parser
+
+# Представительный ответ CompanyFullInfo и строка, которую он даёт
+COMPANY = {"bin": "180240012345", "reestrViolationCount": 2, "warningCount": 1}
+FULL_INFO = {
+    "basicInfo": {
+        "titleRu": {"value": "ТОО «Ромашка»"},
+        "titleKz": {"value": "«Ромашка» ЖШС"},
+        "addressRu": {"value": "г. Алматы, ул. Абая, 1"},
+        "addressKz": {"value": "Алматы қ., Абай к., 1"},
+        "ceo": {"value": {"title": "Иванов Иван Иванович", "position": "Директор"}},
+        "primaryOKED": {"value": "62010"},
+        "secondaryOKED": {"value": ["62020", "63110"]},
+        "kato": {"value": {"value": "751110000", "description": "Алматы"}},
+        "registrationDate": {"value": "2018-02-14"},
+        "status": {"value": {"value": "ACT", "description": "Действующее"}},
+        "onMarket": {"years": 6, "months": 8},
+        "isNds": True,
+        "krp": {"value": {"value": "105", "description": "Малые (<= 5)"}},
+        "kfc": {"value": {"value": "120", "description": "Частное"}},
+        "kse": {"value": {"value": "1", "description": "Коммерческие"}},
+        "postalCode": {"value": "050000"},
+        "cityName": {"value": "Алматы"},
+        "streetName": {"value": "Абая"},
+    },
+    "gosZakupContacts": {
+        "phone": [{"value": "+77011234567"}, {"value": "+77017654321"}],
+        "email": [],
+    },
+    "egovContacts": {"email": ["info@romashka.kz"], "website": ["romashka.kz"]},
+    "debtsInfo": {
+        "kgd": {"totalDebt": 1500.5, "totalFine": "10", "totalMainDebt": 1490},
+        "egov": {
+            "totalDebt": 0,
+            "totalPensionDebt": 1.25,
+            "totalMedicalDebt": None,
+            "totalSocialDebt": "n/a",
+        },
+    },
+    "reestrs": [
+        {"violation": 1, "description": "Отсутствует по юридическому адресу"},
+        {
+            "violation": 5,
+            "description": "Недобросовестный участник государственных закупок",
+        },
+        {"violation": None, "description": "Плательщик НДС"},
+    ],
+    "relatedCompanies": {
+        "filials": {"total": 2},
+        "sameAddress": {"total": "7"},
+        "sameFio": {"total": None},
+    },
+}
+
+EXPECTED_ROW = (
+    "180240012345",
+    "ТОО «Ромашка»",
+    "«Ромашка» ЖШС",
+    "г. Алматы, ул. Абая, 1",
+    "Алматы қ., Абай к., 1",
+    "Иванов Иван Иванович",
+    "Директор",
+    "62010",
+    '["62020", "63110"]',
+    "751110000",
+    "Алматы",
+    "2018-02-14",
+    "ACT",
+    "Действующее",
+    6,
+    8,
+    1,
+    "105",
+    "Малые (<= 5)",
+    "120",
+    "Частное",
+    "1",
+    "Коммерческие",
+    "",
+    "info@romashka.kz",
+    "+77011234567",
+    "",
+    "050000",
+    "Алматы",
+    "Абая",
+    1500.5,
+    10.0,
+    1490.0,
+    0.0,
+    1.25,
+    0.0,
+    0.0,
+    2,
+    1,
+    0,
+    1,
+    0,
+    0,
+    1,
+    0,
+    0,
+    1,
+    1,
+    2,
+    7,
+    0,
+)
+
+COLUMNS = [f.name for f in dataclasses.fields(parser.Entity)]
+
+
+def parse_row(company_data, full_info):
+    return parser.SQLiteSaver.entity_row(
+        parser.entity_from_json(company_data, full_info)
+    )
+
+
+def parse_columns(full_info):
+    return dict(zip(COLUMNS, parse_row({"bin": "1"}, full_info)))
+
+
+class EntityFromJsonTest(unittest.TestCase):
+    def test_representative_response(self):
+        self.assertEqual(parse_row(COMPANY, FULL_INFO), EXPECTED_ROW)
+
+    def test_non_dict_nodes_give_defaults(self):
+        default_row = parser.SQLiteSaver.entity_row(parser.Entity(bin="1"))
+        for full_info in (
+            None,
+            [],
+            "oops",
+            {"basicInfo": ["x"], "debtsInfo": "x", "relatedCompanies": 5},
+            {
+                "basicInfo": {"ceo": "x", "kato": {"value": []}, "onMarket": 3},
+                "debtsInfo": {"kgd": [], "egov": None},
+                "gosZakupContacts": [],
+                "reestrs": ["x", None, 3],
+            },
+        ):
+            with self.subTest(full_info=full_info):
+                self.assertEqual(parse_row({"bin": "1"}, full_info), default_row)
+
+    def test_nested_value_is_coerced_to_str(self):
+        columns = parse_columns({"basicInfo": {"titleRu": {"value": {"value": 7}}}})
+        self.assertEqual(columns["title_ru"], "7")
+
+    def test_violation_codes(self):
+        for violation, expected in (
+            (0, "in_inactive_registry"),
+            (0.0, "in_inactive_registry"),
+            (True, "in_absent_registry"),
+            (3.0, "in_bankrupt_registry"),
+            ("1", None),
+            (None, None),
+            (2.5, None),
+        ):
+            with self.subTest(violation=violation):
+                columns = parse_columns({"reestrs": [{"violation": violation}]})
+                flagged = [
+                    name for name in parser._VIOLATION_ATTR.values() if columns[name]
+                ]
+                self.assertEqual(flagged, [expected] if expected else [])
+
+    def test_reestr_descriptions(self):
+        full_info = copy.deepcopy(FULL_INFO)
+        full_info["reestrs"] = [
+            {"description": None},
+            {"description": {"value": "Плательщик НДС"}},
+            {"description": {"value": None}},
+            {"description": {"text": "государственных закупок"}},
+        ]
+        columns = parse_columns(full_info)
+        self.assertEqual(columns["was_nds"], 1)
+        self.assertEqual(columns["unreliable_gz"], 0)
+        self.assertEqual(columns["unreliable_samruk"], 0)
+
+
+class RunStagesTest(unittest.IsolatedAsyncioTestCase):
+    async def test_broken_pool_ends_run(self):
+        """Падение этапа разбора завершает конвейер, а не вешает его"""
+        pool = ProcessPoolExecutor(max_workers=1)
+        pool.shutdown()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            db_saver = parser.SQLiteSaver(os.path.join(tmp, "companies.db"))
+            company_queue: asyncio.Queue = asyncio.Queue(parser.QUEUE_MAXSIZE)
+            raw_queue: asyncio.Queue = asyncio.Queue(parser.QUEUE_MAXSIZE)
+            row_queue: asyncio.Queue = asyncio.Queue(parser.QUEUE_MAXSIZE)
+
+            async def producer():
+                for i in range(1000):
+                    await raw_queue.put(({"bin": str(i)}, b"{}"))
+
+            parsers = [
+                asyncio.create_task(parser.company_parser(raw_queue, row_queue, pool))
+                for _ in range(2)
+            ]
+            writer = asyncio.create_task(parser.db_writer(row_queue, db_saver))
+
+            try:
+                with self.assertRaises(RuntimeError):
+                    await asyncio.wait_for(
+                        parser.run_stages(
+                            producer(),
+                            company_queue,
+                            raw_queue,
+                            row_queue,
+                            [],
+                            parsers,
+                            writer,
+                        ),
+                        timeout=10,
+                    )
+            finally:
+                db_saver.close()
+
+        self.assertTrue(all(task.done() for task in [*parsers, writer]))
+
+
+class AdaptiveLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_of_429_halves_once_then_recovers(self):
+        now = [100.0]
+        loop = asyncio.get_running_loop()
+        with mock.patch.object(loop, "time", lambda: now[0]):
+            limiter = parser.AdaptiveLimiter(20, 1)
+
+            # 429 от всех одновременных запросов - одно снижение
+            for _ in range(parser.MAX_CONCURRENT_REQUESTS):
+                limiter.on_throttled()
+            self.assertEqual(limiter.max_rate, 10)
+
+            # Через time_period следующий 429 снова снижает частоту
+            now[0] += 1.0
+            limiter.on_throttled()
+            self.assertEqual(limiter.max_rate, 5)
+
+            # Успешные запросы поднимают частоту на 1 в секунду
+            for _ in range(3):
+                now[0] += 1.0
+                limiter.on_success()
+                limiter.on_success()
+            self.assertEqual(limiter.max_rate, 8)
+            self.assertEqual(limiter._rate_per_sec, 8)
+
+
+class _StubResponse:
+    def __init__(self, status, headers=None, body=b""):
+        self.status = status
+        self.headers = headers or {}
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    async def read(self):
+        return self._body
+
+
+class _StubSession:
+    """Отдаёт по две компании на страницу, 429 на throttled_page один раз"""
+
+    def __init__(self, throttled_page, last_page):
+        self.throttled_page = throttled_page
+        self.last_page = last_page
+        self.requested = []
+
+    def post(self, url, json):
+        page = json["page"]
+        self.requested.append(page)
+        if page == self.throttled_page and self.requested.count(page) == 1:
+            return _StubResponse(429, {"Retry-After": "0"})
+        results = (
+            [] if page > self.last_page else [{"bin": f"{page}-{i}"} for i in range(2)]
+        )
+        return _StubResponse(200, body=_json_bytes({"results": results}))
+
+
+def _json_bytes(value):
+    return json.dumps(value).encode()
+
+
+class _NothingSaved:
+    def saved_bins(self, bins):
+        return set()
+
+
+class PageProducerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_retry_after_zero_retries_the_page(self):
+        session = _StubSession(throttled_page=826, last_page=827)
+        company_queue: asyncio.Queue = asyncio.Queue()
+
+        await parser.page_producer(session, company_queue, _NothingSaved())
+
+        self.assertEqual(session.requested, [825, 826, 826, 827, 828])
+        queued = [
+            company_queue.get_nowait()["bin"] for _ in range(company_queue.qsize())
+        ]
+        self.assertEqual(queued, ["825-0", "825-1", "826-0", "826-1", "827-0", "827-1"])
+
+
+if __name__ == "__main__":
+    unittest.main()
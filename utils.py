@@ -0,0 +1,23 @@
+from typing import Callable, Dict, Optional
+
+
+class KeepChars(Dict[int, Optional[int]]):
+    """Таблица для str.translate: оставляет символы, для которых keep(char) истинно
+
+    Решение для каждого символа вычисляется один раз и запоминается.
+    """
+
+    def __init__(self, keep: Callable[[str], bool]):
+        super().__init__()
+        self.keep = keep
+
+    def __missing__(self, code: int) -> Optional[int]:
+        self[code] = code if self.keep(chr(code)) else None
+        return self[code]
+
+
+# Оставляет цифры в смысле str.isdigit (включая надстрочные и т.п.)
+KEEP_DIGITS = KeepChars(str.isdigit)
+
+# Оставляет десятичные цифры - то же, что удаление re.sub(r"\D", "", ...)
+KEEP_DECIMALS = KeepChars(str.isdecimal)